@@ -1,28 +1,68 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, request, jsonify, abort, g
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from jwt.exceptions import PyJWTError
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+import bisect
+import hashlib
+import hmac
+import json
 import logging
+import math
+import os
 import sys
+import threading
+import time
+import urllib.request
+import uuid
 import gettext  # For internationalization support
 
+from admission import AdmissionController
+
 # Configure logging
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configure internationalization
-gettext.install('messages', localedir=None, unicode=True)
+gettext.install('messages', localedir=None)
 
 app = Flask(__name__)
 
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = 'super-secret'  # Change this!
+# Tokens can be revoked via /logout. Revocations live in memory only, so tokens
+# are also bound to the primary's instance id and are rejected after a restart.
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=12)
 jwt = JWTManager(app)
 
+# Configure the /admin endpoints. Admin requests carry this token in X-Admin-Token.
+app.config['ADMIN_TOKEN'] = 'admin-secret'  # Change this!
+
+# Configure replication. Followers set BANK_PRIMARY_URL and serve reads only.
+app.config['REPLICATION_TOKEN'] = 'replication-secret'  # Change this!
+app.config['PRIMARY_URL'] = os.environ.get('BANK_PRIMARY_URL')
+app.config['MAX_STALENESS_SECONDS'] = 5.0
+
+# Configure admission control. Lower priority values are admitted first;
+# requests waiting longer than their deadline are shed with 503.
+app.config['ADMISSION_MAX_CONCURRENCY'] = 16
+app.config['ADMISSION_CLASSES'] = {
+    'read': {'priority': 0, 'limit': 16, 'queue': 128, 'deadline': 0.25},
+    'write': {'priority': 1, 'limit': 8, 'queue': 128, 'deadline': 0.25},
+    'auth': {'priority': 2, 'limit': 4, 'queue': 32, 'deadline': 0.5},
+    'admin': {'priority': 3, 'limit': 2, 'queue': 16, 'deadline': 0.5},
+    'register': {'priority': 3, 'limit': 2, 'queue': 16, 'deadline': 0.5}
+}
+admission = AdmissionController(app.config['ADMISSION_MAX_CONCURRENCY'], app.config['ADMISSION_CLASSES'])
+
 # Configure rate limiting
 limiter = Limiter(
-    app,
-    key_func=get_remote_address,
+    get_remote_address,
+    app=app,
     default_limits=["1000 per day", "200 per hour"]
 )
 
@@ -36,6 +76,18 @@ class User:
         self._age = self._validate_age(age)
         self._gender = self._validate_gender(gender)
 
+    @classmethod
+    def from_hash(cls, name, password_hash, age, gender):
+        """
+        Rebuild a User from an already hashed password, e.g. on a replica.
+        """
+        user = cls.__new__(cls)
+        user._name = name
+        user._password = password_hash
+        user._age = user._validate_age(age)
+        user._gender = user._validate_gender(gender)
+        return user
+
     @property
     def name(self):
         return self._name
@@ -79,15 +131,17 @@ class User:
         if gender not in allowed_genders:
             logging.error(_("Invalid gender. Gender should be 'Male', 'Female', or 'Other'."))
             raise ValueError(_("Invalid gender. Gender should be 'Male', 'Female', or 'Other'."))
+        return gender
 
 
 class Bank:
-    def __init__(self, user):
+    def __init__(self, user, balance=0):
         """
-        Initialize a new Bank object with a User instance and a balance of 0.
+        Initialize a new Bank object with a User instance and a balance of 0,
+        or the given balance when restoring an account from a snapshot.
         """
         self._user = user
-        self._balance = 0
+        self._balance = balance
 
     @property
     def user(self):
@@ -101,7 +155,7 @@ class Bank:
         """
         Deposit the specified amount into the account and update the balance.
         """
-        if not isinstance(amount, (int, float)):
+        if not isinstance(amount, (int, float)) or not math.isfinite(amount):
             logging.error(_("Invalid amount. Please provide a valid number."))
             return
         if amount <= 0:
@@ -109,13 +163,14 @@ class Bank:
             return
         self._balance += amount
         logging.info(_("Deposit successful. Account balance: $ {self.balance}"))
+        return True
 
     
     def withdraw(self, amount):
         """
         Withdraw the specified amount from the account and update the balance.
         """
-        if not isinstance(amount, (int, float)):
+        if not isinstance(amount, (int, float)) or not math.isfinite(amount):
             logging.error(_("Invalid amount. Please provide a valid number."))
             return
         if amount <= 0:
@@ -126,6 +181,7 @@ class Bank:
             return
         self._balance -= amount
         logging.info(_("Withdrawal successful. Account balance: $ {self.balance}"))
+        return True
 
     def view_balance(self):
         """
@@ -137,20 +193,357 @@ class Bank:
         }
 
 
+class RevocationSet:
+    def __init__(self, prune_threshold=65536):
+        """
+        Track revoked token ids until the tokens would have expired anyway.
+        """
+        self._prune_threshold = prune_threshold
+        self._revoked = {}  # Token id -> expiry timestamp
+
+    def add(self, jti, expires_at):
+        """
+        Revoke a token id until its expiry timestamp.
+        """
+        self._revoked[jti] = expires_at
+        if len(self._revoked) > self._prune_threshold:
+            self.prune()
+
+    def __contains__(self, jti):
+        return jti in self._revoked
+
+    def items(self):
+        """
+        Return the revoked token ids with their expiry timestamps.
+        """
+        return list(self._revoked.items())
+
+    def prune(self):
+        """
+        Forget expired tokens. If most entries are still live, raise the
+        threshold so the next prune happens only after the set doubles.
+        """
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self._prune_threshold = max(self._prune_threshold, 2 * len(self._revoked))
+
+
+class TokenCache:
+    def __init__(self, max_size=10000):
+        """
+        Cache verified token claims by token digest until the token expires.
+        """
+        self._max_size = max_size
+        self._claims = OrderedDict()  # SHA-256 of token -> claims, oldest first
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Return the cached claims of a token, or None if unknown or expired.
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            claims = self._claims.get(digest)
+            if claims and claims['exp'] <= time.time():
+                del self._claims[digest]
+                return None
+            return claims
+
+    def put(self, token, claims):
+        """
+        Store the claims of a verified token, evicting the oldest entry when full.
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._claims[digest] = claims
+            if len(self._claims) > self._max_size:
+                self._claims.popitem(last=False)
+
+
+class NameIndex:
+    BUCKET_SIZE = 1000
+
+    def __init__(self):
+        """
+        Keep names sorted in buckets of bounded size, so an insert only shifts
+        one bucket instead of the whole index.
+        """
+        self._buckets = []
+        self._maxes = []  # Largest name in each bucket
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, name):
+        """
+        Insert a name in sorted position.
+        """
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([name])
+            self._maxes.append(name)
+            return
+        i = min(bisect.bisect_left(self._maxes, name), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        bisect.insort(bucket, name)
+        self._maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            tail = bucket[self.BUCKET_SIZE:]
+            del bucket[self.BUCKET_SIZE:]
+            self._buckets.insert(i + 1, tail)
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, tail[-1])
+
+    def between(self, low, high=None):
+        """
+        Return the names in [low, high) in order. A high of None means no upper bound.
+        """
+        names = []
+        first = bisect.bisect_left(self._maxes, low)
+        for i in range(first, len(self._buckets)):
+            bucket = self._buckets[i]
+            start = bisect.bisect_left(bucket, low) if i == first else 0
+            if high is not None and bucket[-1] >= high:
+                names.extend(bucket[start:bisect.bisect_left(bucket, high)])
+                break
+            names.extend(bucket[start:])
+        return names
+
+    def page(self, offset, limit=None):
+        """
+        Return up to `limit` names in order, skipping the first `offset`.
+        """
+        names = []
+        for bucket in self._buckets:
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            names.extend(bucket[offset:])
+            offset = 0
+            if limit is not None and len(names) >= limit:
+                break
+        return names if limit is None else names[:limit]
+
+
 class AuthManager:
     _instance = None
 
+    # Events kept in memory before the log is folded into a snapshot
+    LOG_RETENTION = 100000
+
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             cls._instance = super(AuthManager, cls).__new__(cls, *args, **kwargs)
-            cls._instance._users = {}
+            cls._instance.instance_id = uuid.uuid4().hex  # Changes on every restart
+            cls._instance._lock = threading.RLock()
+            cls._instance._reset()
         return cls._instance
 
+    def _reset(self):
+        self._users = {}
+        self._accounts = {}  # User name -> Bank
+        self._snapshot = None  # State as of event self._log_start
+        self._log_start = 0
+        self._log = []  # Ordered register/deposit/withdraw/revoke events after the snapshot
+        self._revoked = RevocationSet()
+        self._names = NameIndex()  # Sorted name index for prefix queries
+        self._rows = []  # Row id -> user name
+        self._gender_bitmaps = {}  # Gender -> bytearray bitmap of row ids
+        self._age_bitmaps = {}  # Age -> bytearray bitmap of row ids
+
     def register_user(self, user):
         """
-        Register a new user in the system.
+        Register a new user in the system and update the secondary indexes.
+        Returns False if the name is already taken.
         """
+        with self._lock:
+            if user.name in self._users:
+                return False
+            self._index_user(user)
+            self._accounts[user.name] = Bank(user)
+            self._record({
+                'type': 'register',
+                'name': user.name,
+                'password': user.password,
+                'age': user.age,
+                'gender': user.gender
+            })
+            return True
+
+    def _index_user(self, user):
+        row = len(self._rows)
+        self._rows.append(user.name)
+        self._names.add(user.name)
         self._users[user.name] = user
+        for bitmap in (self._gender_bitmaps.setdefault(user.gender, bytearray()),
+                       self._age_bitmaps.setdefault(user.age, bytearray())):
+            if len(bitmap) <= row >> 3:
+                bitmap.extend(bytes((row >> 3) + 1 - len(bitmap)))
+            bitmap[row >> 3] |= 1 << (row & 7)
+
+    def account(self, name):
+        """
+        Return the Bank account of a registered user, or None.
+        """
+        return self._accounts.get(name)
+
+    def deposit(self, name, amount):
+        """
+        Deposit into a user's account and record the event in the replication log.
+        """
+        with self._lock:
+            if not self._accounts[name].deposit(amount):
+                return False
+            self._record({'type': 'deposit', 'name': name, 'amount': amount})
+            return True
+
+    def withdraw(self, name, amount):
+        """
+        Withdraw from a user's account and record the event in the replication log.
+        """
+        with self._lock:
+            if not self._accounts[name].withdraw(amount):
+                return False
+            self._record({'type': 'withdraw', 'name': name, 'amount': amount})
+            return True
+
+    @property
+    def head(self):
+        """
+        Sequence number of the last event in the replication log.
+        """
+        return self._log_start + len(self._log)
+
+    def changes_since(self, seq, limit=1000):
+        """
+        Return the changes a follower at sequence number `seq` needs: up to
+        `limit` events, preceded by the snapshot if `seq` is older than it.
+        """
+        with self._lock:
+            snapshot = self._snapshot if seq < self._log_start else None
+            start = max(seq - self._log_start, 0)
+            return snapshot, self._log[start:start + limit]
+
+    def load_snapshot(self, snapshot):
+        """
+        Replace all local state with a snapshot shipped from the primary.
+        """
+        with self._lock:
+            self._reset()
+            for record in snapshot['users']:
+                user = User.from_hash(record['name'], record['password'], record['age'], record['gender'])
+                self._index_user(user)
+                self._accounts[user.name] = Bank(user, record['balance'])
+            for jti, expires_at in snapshot['revoked']:
+                self._revoked.add(jti, expires_at)
+            self._snapshot = snapshot
+            self._log_start = snapshot['seq']
+
+    def apply_event(self, event):
+        """
+        Replay an event shipped from the primary. Events must arrive in order.
+        """
+        with self._lock:
+            if event['seq'] != self.head + 1:
+                raise ValueError(f"Expected event {self.head + 1}, got {event['seq']}")
+            if event['type'] == 'register':
+                self.register_user(User.from_hash(event['name'], event['password'], event['age'], event['gender']))
+            elif event['type'] == 'deposit':
+                self.deposit(event['name'], event['amount'])
+            elif event['type'] == 'withdraw':
+                self.withdraw(event['name'], event['amount'])
+            elif event['type'] == 'revoke':
+                self.revoke_token(event['jti'], event['exp'])
+            else:
+                raise ValueError(f"Unknown event type {event['type']}")
+            if self.head != event['seq']:
+                raise ValueError(f"Event {event['seq']} could not be applied")
+
+    def revoke_token(self, jti, expires_at):
+        """
+        Revoke an access token and record the event in the replication log.
+        """
+        with self._lock:
+            self._revoked.add(jti, expires_at)
+            self._record({'type': 'revoke', 'jti': jti, 'exp': expires_at})
+
+    def is_revoked(self, jti):
+        """
+        Check whether an access token has been revoked.
+        """
+        return jti in self._revoked
+
+    def _record(self, event):
+        event['seq'] = self.head + 1
+        self._log.append(event)
+        if len(self._log) >= self.LOG_RETENTION:
+            self._take_snapshot()
+
+    def _take_snapshot(self):
+        # Fold the log into a snapshot of the current state and drop it. Followers
+        # that fall behind the snapshot are sent the snapshot instead of old events.
+        self._snapshot = {
+            'seq': self.head,
+            'users': [
+                {
+                    'name': name,
+                    'password': self._users[name].password,
+                    'age': self._users[name].age,
+                    'gender': self._users[name].gender,
+                    'balance': self._accounts[name].balance
+                }
+                for name in self._rows
+            ],
+            'revoked': self._revoked.items()
+        }
+        self._log_start = self.head
+        self._log = []
+
+    def search_users(self, prefix=None, gender=None, min_age=None, max_age=None, offset=0, limit=None):
+        """
+        Find users matching a name prefix, gender and age range, sorted by name.
+        Returns the total number of matches and the requested page of users.
+        """
+        with self._lock:
+            if prefix:
+                # Names sharing a prefix form a contiguous range of the name index
+                last = ord(prefix[-1])
+                end = prefix[:-1] + chr(last + 1) if last < sys.maxunicode else None
+                names = self._names.between(prefix, end)
+                if gender is not None or min_age is not None or max_age is not None:
+                    names = [
+                        name for name in names
+                        if (gender is None or self._users[name].gender == gender)
+                        and (min_age is None or self._users[name].age >= min_age)
+                        and (max_age is None or self._users[name].age <= max_age)
+                    ]
+            elif gender is None and min_age is None and max_age is None:
+                return len(self._names), [self._users[name] for name in self._names.page(offset, limit)]
+            else:
+                names = self._match_bitmaps(gender, min_age, max_age)
+            end = None if limit is None else offset + limit
+            return len(names), [self._users[name] for name in names[offset:end]]
+
+    def _match_bitmaps(self, gender, min_age, max_age):
+        # Bitmaps are combined as ints, which does the AND/OR a machine word at a time
+        mask = None
+        if gender is not None:
+            mask = int.from_bytes(self._gender_bitmaps.get(gender, b''), 'little')
+        if min_age is not None or max_age is not None:
+            ages = 0
+            for age, bitmap in self._age_bitmaps.items():
+                if (min_age is None or age >= min_age) and (max_age is None or age <= max_age):
+                    ages |= int.from_bytes(bitmap, 'little')
+            mask = ages if mask is None else mask & ages
+
+        bits = bin(mask)[:1:-1]  # Least significant bit first
+        rows = []
+        row = bits.find('1')
+        while row != -1:
+            rows.append(row)
+            row = bits.find('1', row + 1)
+        return sorted(self._rows[row] for row in rows)
 
     def authenticate(self, name, password):
         """
@@ -162,79 +555,284 @@ class AuthManager:
         return None
 
 
+class Replicator:
+    def __init__(self, auth_manager, primary_url, token, interval=0.5):
+        """
+        Follow the replication log of a primary and apply it to the local AuthManager.
+        """
+        self._auth_manager = auth_manager
+        self._primary_url = primary_url.rstrip('/')
+        self._token = token
+        self._interval = interval
+        self._primary_head = 0
+        self._primary_instance = None
+        self._caught_up_at = None
+
+    def start(self):
+        """
+        Start polling the primary in a background thread.
+        """
+        thread = threading.Thread(target=self._run, name='replicator', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self):
+        while True:
+            try:
+                if not self.sync():
+                    continue  # More events are pending, fetch them right away
+            except Exception as e:
+                # Keep polling: reads are refused with 503 once staleness exceeds the bound
+                logging.error(f"Replication from {self._primary_url} failed: {e!r}")
+            time.sleep(self._interval)
+
+    def sync(self):
+        """
+        Fetch and apply one batch of events. Returns True once caught up.
+        """
+        requested_at = time.time()
+        req = urllib.request.Request(
+            f"{self._primary_url}/replication/log?since={self._auth_manager.head}",
+            headers={'X-Replication-Token': self._token}
+        )
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            data = json.load(resp)
+        if self._primary_instance is None:
+            self._primary_instance = data['instance']
+        elif data['instance'] != self._primary_instance:
+            raise RuntimeError(
+                f"Primary instance changed from {self._primary_instance} to {data['instance']}; "
+                f"the primary restarted and lost its state, rebuild the follower"
+            )
+        if data['head'] < self._auth_manager.head:
+            raise RuntimeError(
+                f"Primary log ends at event {data['head']} but this follower applied "
+                f"{self._auth_manager.head}; the primary lost its state, rebuild the follower"
+            )
+        if data['snapshot']:
+            self._auth_manager.load_snapshot(data['snapshot'])
+        for event in data['events']:
+            self._auth_manager.apply_event(event)
+        self._primary_head = data['head']
+        if self._auth_manager.head >= self._primary_head:
+            # Everything the primary had when we asked is applied locally
+            self._caught_up_at = requested_at
+            return True
+        return False
+
+    @property
+    def primary_instance(self):
+        """
+        Instance id of the primary being followed, once the first sync is done.
+        """
+        return self._primary_instance
+
+    def staleness(self):
+        """
+        Upper bound, in seconds, on how far local state lags behind the primary.
+        """
+        if self._caught_up_at is None:
+            return float('inf')
+        return time.time() - self._caught_up_at
+
+    def metrics(self):
+        """
+        Report replication lag in events and seconds.
+        """
+        staleness = self.staleness()
+        return {
+            'applied_seq': self._auth_manager.head,
+            'primary_seq': self._primary_head,
+            'lag_events': max(self._primary_head - self._auth_manager.head, 0),
+            'staleness_seconds': None if staleness == float('inf') else staleness
+        }
+
+
 # Routes
 auth_manager = AuthManager()
+replicator = None
+if app.config['PRIMARY_URL']:
+    replicator = Replicator(auth_manager, app.config['PRIMARY_URL'], app.config['REPLICATION_TOKEN'])
+
+token_cache = TokenCache()
+
+WRITE_ENDPOINTS = {'register_user', 'deposit', 'withdraw', 'logout'}
+
+def primary_instance():
+    """
+    Instance id of the primary whose state this process serves, if known yet.
+    """
+    return replicator.primary_instance if replicator else auth_manager.instance_id
+
+def token_required(fn):
+    """
+    Require a valid access token, verifying each distinct token only once.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return jsonify({'error': 'Missing access token'}), 401
+        token = auth_header[len('Bearer '):]
+        claims = token_cache.get(token)
+        if claims is None:
+            try:
+                claims = decode_token(token)
+            except (JWTExtendedException, PyJWTError):
+                return jsonify({'error': 'Invalid access token'}), 401
+            if claims.get('type') != 'access':
+                return jsonify({'error': 'Invalid access token'}), 401
+            token_cache.put(token, claims)
+        if auth_manager.is_revoked(claims['jti']):
+            return jsonify({'error': 'Access token has been revoked'}), 401
+        instance = primary_instance()
+        if instance is not None and claims.get('instance') != instance:
+            return jsonify({'error': 'Access token was issued before a server restart'}), 401
+        g.jwt_claims = claims
+        return fn(*args, **kwargs)
+    return wrapper
+
+def current_identity():
+    return g.jwt_claims[app.config.get('JWT_IDENTITY_CLAIM', 'sub')]
+
+@app.before_request
+def reject_writes_on_replica():
+    if replicator and request.endpoint in WRITE_ENDPOINTS:
+        return jsonify({'error': 'Read-only replica, send writes to the primary'}), 403
+
+@app.route('/replication/log', methods=['GET'])
+def replication_log():
+    if not hmac.compare_digest(request.headers.get('X-Replication-Token', ''), app.config['REPLICATION_TOKEN']):
+        return jsonify({'error': 'Invalid replication token'}), 403
+    try:
+        since = max(int(request.args.get('since', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters'}), 400
+    snapshot, events = auth_manager.changes_since(since)
+    return jsonify({
+        'snapshot': snapshot,
+        'events': events,
+        'head': auth_manager.head,
+        'instance': auth_manager.instance_id
+    }), 200
+
+@app.route('/replication/status', methods=['GET'])
+def replication_status():
+    if replicator:
+        return jsonify(dict(role='follower', **replicator.metrics())), 200
+    return jsonify({'role': 'primary', 'head': auth_manager.head}), 200
+
+@app.route('/admission/metrics', methods=['GET'])
+def admission_metrics():
+    return jsonify(admission.metrics()), 200
 
 @app.route('/register', methods=['POST'])
+@admission.admit('register')
 def register_user():
     data = request.json
     if not all(key in data for key in ['name', 'password', 'age', 'gender']):
         return jsonify({'error': 'Missing required parameters'}), 400
     try:
         user = User(data['name'], data['password'], data['age'], data['gender'])
-        auth_manager.register_user(user)
+        if not auth_manager.register_user(user):
+            return jsonify({'error': 'User already exists'}), 409
         return jsonify({'message': 'User registered successfully'}), 201
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/authenticate', methods=['POST'])
+@admission.admit('auth')
 def authenticate_user():
     data = request.json
     if not all(key in data for key in ['name', 'password']):
         return jsonify({'error': 'Missing required parameters'}), 400
     user = auth_manager.authenticate(data['name'], data['password'])
     if user:
-        access_token = create_access_token(identity=user.name)
+        access_token = create_access_token(identity=user.name, additional_claims={'instance': primary_instance()})
         return jsonify({'access_token': access_token}), 200
     return jsonify({'error': 'Invalid credentials'}), 401
 
+@app.route('/logout', methods=['POST'])
+@admission.admit('write')
+@token_required
+def logout():
+    auth_manager.revoke_token(g.jwt_claims['jti'], g.jwt_claims['exp'])
+    return jsonify({'message': 'Token revoked'}), 200
+
+@app.route('/admin/users', methods=['GET'])
+@admission.admit('admin')
+def search_users():
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), app.config['ADMIN_TOKEN']):
+        return jsonify({'error': 'Admin access required'}), 403
+    args = request.args
+    try:
+        min_age = int(args['min_age']) if 'min_age' in args else None
+        max_age = int(args['max_age']) if 'max_age' in args else None
+        page = max(int(args.get('page', 1)), 1)
+        per_page = min(max(int(args.get('per_page', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'Invalid query parameters'}), 400
+    total, users = auth_manager.search_users(
+        args.get('prefix'), args.get('gender'), min_age, max_age, (page - 1) * per_page, per_page
+    )
+    return jsonify({
+        'users': [user.view_detail() for user in users],
+        'page': page,
+        'per_page': per_page,
+        'total': total
+    }), 200
+
 @app.route('/bank/deposit', methods=['POST'])
-@jwt_required()
+@admission.admit('write')
+@token_required
 @limiter.limit("1000 per day")
 def deposit():
     data = request.json
     if not all(key in data for key in ['amount']):
         return jsonify({'error': 'Missing required parameters'}), 400
-    current_user = get_jwt_identity()
-    user = auth_manager._users.get(current_user)
-    if not user:
+    current_user = current_identity()
+    if not auth_manager.account(current_user):
         return jsonify({'error': 'User not found'}), 404
     try:
         amount = float(data['amount'])
-        bank = Bank(user)
-        bank.deposit(amount)
+        if not auth_manager.deposit(current_user, amount):
+            return jsonify({'error': 'Deposit failed'}), 400
         return jsonify({'message': 'Deposit successful'}), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/bank/withdraw', methods=['POST'])
-@jwt_required()
+@admission.admit('write')
+@token_required
 @limiter.limit("1000 per day")
 def withdraw():
     data = request.json
     if not all(key in data for key in ['amount']):
         return jsonify({'error': 'Missing required parameters'}), 400
-    current_user = get_jwt_identity()
-    user = auth_manager._users.get(current_user)
-    if not user:
+    current_user = current_identity()
+    if not auth_manager.account(current_user):
         return jsonify({'error': 'User not found'}), 404
     try:
         amount = float(data['amount'])
-        bank = Bank(user)
-        bank.withdraw(amount)
+        if not auth_manager.withdraw(current_user, amount):
+            return jsonify({'error': 'Withdrawal failed'}), 400
         return jsonify({'message': 'Withdrawal successful'}), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/bank/balance', methods=['GET'])
-@jwt_required()
+@admission.admit('read')
+@token_required
 def get_balance():
-    current_user = get_jwt_identity()
-    user = auth_manager._users.get(current_user)
-    if not user:
+    if replicator and replicator.staleness() > app.config['MAX_STALENESS_SECONDS']:
+        return jsonify({'error': 'Replica is too far behind the primary'}), 503
+    current_user = current_identity()
+    bank = auth_manager.account(current_user)
+    if not bank:
         return jsonify({'error': 'User not found'}), 404
-    bank = Bank(user)
     return jsonify(bank.view_balance()), 200
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    if replicator:
+        replicator.start()
+    app.run(debug=True, use_reloader=False, port=int(os.environ.get('BANK_PORT', 5000)))
@@ -3,14 +3,27 @@ import logging
 import sys
 import gettext  # For internationalization support
 
+from admission import AdmissionController
+
 # Configure logging
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configure internationalization
-gettext.install('messages', localedir=None, unicode=True)
+gettext.install('messages', localedir=None)
 
 app = Flask(__name__)
 
+# Configure admission control. Lower priority values are admitted first;
+# requests waiting longer than their deadline are shed with 503.
+app.config['ADMISSION_MAX_CONCURRENCY'] = 16
+app.config['ADMISSION_CLASSES'] = {
+    'read': {'priority': 0, 'limit': 16, 'queue': 128, 'deadline': 0.25},
+    'write': {'priority': 1, 'limit': 8, 'queue': 128, 'deadline': 0.25},
+    'auth': {'priority': 2, 'limit': 4, 'queue': 32, 'deadline': 0.5},
+    'register': {'priority': 3, 'limit': 2, 'queue': 16, 'deadline': 0.5}
+}
+admission = AdmissionController(app.config['ADMISSION_MAX_CONCURRENCY'], app.config['ADMISSION_CLASSES'])
+
 class User:
     def __init__(self, name, age, gender):
         """
@@ -143,7 +156,12 @@ class AuthManager:
 # Routes
 auth_manager = AuthManager()
 
+@app.route('/admission/metrics', methods=['GET'])
+def admission_metrics():
+    return jsonify(admission.metrics()), 200
+
 @app.route('/register', methods=['POST'])
+@admission.admit('register')
 def register_user():
     data = request.json
     if not all(key in data for key in ['name', 'age', 'gender']):
@@ -156,6 +174,7 @@ def register_user():
         return jsonify({'error': str(e)}), 400
 
 @app.route('/authenticate', methods=['POST'])
+@admission.admit('auth')
 def authenticate_user():
     data = request.json
     if 'name' not in data:
@@ -165,6 +184,7 @@ def authenticate_user():
     return jsonify({'authenticated': False}), 401
 
 @app.route('/bank/deposit', methods=['POST'])
+@admission.admit('write')
 def deposit():
     data = request.json
     if not all(key in data for key in ['name', 'amount']):
@@ -181,6 +201,7 @@ def deposit():
         return jsonify({'error': str(e)}), 400
 
 @app.route('/bank/withdraw', methods=['POST'])
+@admission.admit('write')
 def withdraw():
     data = request.json
     if not all(key in data for key in ['name', 'amount']):
@@ -197,6 +218,7 @@ def withdraw():
         return jsonify({'error': str(e)}), 400
 
 @app.route('/bank/balance', methods=['GET'])
+@admission.admit('read')
 def get_balance():
     data = request.json
     if 'name' not in data:
@@ -0,0 +1,123 @@
+import itertools
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+
+class _Ticket:
+    __slots__ = ('seq', 'cond', 'admitted', 'shed')
+
+    def __init__(self, seq, cond):
+        self.seq = seq
+        self.cond = cond
+        self.admitted = False
+        self.shed = False
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency, classes):
+        """
+        Initialize an admission controller in front of the request handlers.
+
+        `classes` maps a class name to its settings: `priority` (lower is
+        served first), `limit` (concurrent requests of that class), `queue`
+        (requests allowed to wait) and `deadline` (seconds a request may wait
+        before it is shed).
+        """
+        self._max_concurrency = max_concurrency
+        self._classes = classes
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues = {name: deque() for name in classes}  # FIFO of waiting tickets per class
+        self._in_flight = 0
+        self._stats = {
+            name: {'waiting': 0, 'in_flight': 0, 'admitted': 0, 'rejected': 0, 'shed': 0}
+            for name in classes
+        }
+
+    def acquire(self, name):
+        """
+        Wait for a slot for a request of the given class. Returns False if the
+        request was rejected because the queue is full or its deadline passed.
+        """
+        settings = self._classes[name]
+        stats = self._stats[name]
+        deadline = time.monotonic() + settings['deadline']
+        with self._lock:
+            if stats['waiting'] >= settings['queue']:
+                stats['rejected'] += 1
+                return False
+            ticket = _Ticket(next(self._seq), threading.Condition(self._lock))
+            self._queues[name].append(ticket)
+            stats['waiting'] += 1
+            self._dispatch()
+            while not ticket.admitted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    ticket.shed = True  # Dropped from the queue when it reaches the front
+                    stats['waiting'] -= 1
+                    stats['shed'] += 1
+                    return False
+                ticket.cond.wait(remaining)
+            return True
+
+    def release(self, name):
+        """
+        Free the slot held by a finished request and admit the next waiter.
+        """
+        with self._lock:
+            self._stats[name]['in_flight'] -= 1
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        # Admit waiters, highest priority class first, while slots are free.
+        # Only the admitted tickets are woken.
+        while self._in_flight < self._max_concurrency:
+            best = None
+            for name, queue in self._queues.items():
+                while queue and queue[0].shed:
+                    queue.popleft()
+                if queue and self._stats[name]['in_flight'] < self._classes[name]['limit']:
+                    key = (self._classes[name]['priority'], queue[0].seq)
+                    if best is None or key < best[0]:
+                        best = (key, name)
+            if best is None:
+                return
+            name = best[1]
+            ticket = self._queues[name].popleft()
+            ticket.admitted = True
+            stats = self._stats[name]
+            stats['waiting'] -= 1
+            stats['in_flight'] += 1
+            stats['admitted'] += 1
+            self._in_flight += 1
+            ticket.cond.notify()
+
+    def metrics(self):
+        """
+        Report queue depth, in-flight requests and rejections per class.
+        """
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'max_concurrency': self._max_concurrency,
+                'classes': {name: dict(stats) for name, stats in self._stats.items()}
+            }
+
+    def admit(self, name):
+        """
+        Decorate a route so it only runs once admitted, answering 503 otherwise.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.acquire(name):
+                    return {'error': 'Server is overloaded, please retry'}, 503, {'Retry-After': '1'}
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.release(name)
+            return wrapper
+        return decorator
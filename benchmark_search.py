@@ -0,0 +1,83 @@
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import time
+
+GENDERS = ["Male", "Female", "Other"]
+
+QUERIES = [
+    {'prefix': 'u00'},
+    {'prefix': 'u00', 'gender': 'Other', 'min_age': 18, 'max_age': 25},
+    {'gender': 'Other', 'min_age': 18, 'max_age': 25},
+    {'gender': 'Female'},
+    {'min_age': 60},
+]
+
+
+def load_api():
+    """
+    Import API-Improved.py, which cannot be imported by name because of the dash.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'API-Improved.py')
+    spec = importlib.util.spec_from_file_location('api_improved', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def full_scan(users, prefix=None, gender=None, min_age=None, max_age=None):
+    """
+    Answer a query by checking every registered user.
+    """
+    matches = [
+        user for user in users.values()
+        if (not prefix or user.name.startswith(prefix))
+        and (gender is None or user.gender == gender)
+        and (min_age is None or user.age >= min_age)
+        and (max_age is None or user.age <= max_age)
+    ]
+    matches.sort(key=lambda user: user.name)
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /admin/users index queries with a full scan.")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    api = load_api()
+    logging.disable(logging.CRITICAL)
+    auth_manager = api.auth_manager
+    rng = random.Random(0)
+    ids = list(range(args.users))
+    rng.shuffle(ids)  # Register in random name order, as real sign-ups arrive
+    batch = max(args.users // 10, 1)
+    start = batch_start = time.perf_counter()
+    for count, i in enumerate(ids, 1):
+        auth_manager.register_user(api.User.from_hash(f"u{i:07d}", 'hash', rng.randint(1, 90), rng.choice(GENDERS)))
+        if count % batch == 0:
+            now = time.perf_counter()
+            print(f"Registered {count:>9,} users: {(now - batch_start) / batch * 1e6:6.1f} us per registration in the last batch")
+            batch_start = now
+    print(f"Registered {args.users:,} users in {time.perf_counter() - start:.1f}s")
+
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            total, _users = auth_manager.search_users(**query, limit=50)
+        indexed = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            expected = full_scan(auth_manager._users, **query)
+        scanned = (time.perf_counter() - start) / args.repeat
+
+        assert total == len(expected)
+        print(f"{str(query):<70} matches {total:>8,}  index {indexed * 1000:9.1f} ms  scan {scanned * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
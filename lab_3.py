@@ -6,7 +6,7 @@ import gettext  # For internationalization support
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configure internationalization
-gettext.install('messages', localedir=None, unicode=True)
+gettext.install('messages', localedir=None)
 
 class User:
     def __init__(self, name, age, gender):
@@ -0,0 +1,137 @@
+import argparse
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from benchmark_search import load_api
+
+# Share of each route in the offered load
+MIX = [('balance', 0.6), ('deposit', 0.25), ('authenticate', 0.1), ('register', 0.05)]
+PASSWORD = 'load-test-password'
+
+
+def call(url, method='GET', body=None, headers=None):
+    """
+    Send one request and return (status, seconds). Status 0 means no response.
+    """
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers=dict(headers or {}))
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def run(base_url, tokens, rate, duration):
+    """
+    Offer `rate` requests per second for `duration` seconds and return
+    (route, status, latency) samples.
+    """
+    rng = random.Random(0)
+    routes, weights = zip(*MIX)
+    new_names = (f"load-user-{i}" for i in itertools.count())
+    samples = []
+    lock = threading.Lock()
+
+    def request(route, token, name):
+        headers = {'Authorization': f"Bearer {token}"}
+        if route == 'balance':
+            status, latency = call(f"{base_url}/bank/balance", headers=headers)
+        elif route == 'deposit':
+            status, latency = call(f"{base_url}/bank/deposit", 'POST', {'amount': 10}, headers)
+        elif route == 'authenticate':
+            status, latency = call(f"{base_url}/authenticate", 'POST', {'name': name, 'password': PASSWORD})
+        else:
+            body = {'name': next(new_names), 'password': PASSWORD, 'age': 30, 'gender': 'Other'}
+            status, latency = call(f"{base_url}/register", 'POST', body)
+        with lock:
+            samples.append((route, status, latency))
+
+    threads = []
+    start = time.perf_counter()
+    for i in range(int(rate * duration)):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name, token = rng.choice(tokens)
+        thread = threading.Thread(target=request, args=(rng.choices(routes, weights)[0], token, name))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int((len(values) - 1) * q)] if values else 0.0
+
+
+def report(label, samples):
+    print(label)
+    for route, _ in MIX:
+        latencies = [latency for r, _, latency in samples if r == route]
+        served = [latency for r, status, latency in samples if r == route and status < 500 and status]
+        shed = sum(1 for r, status, _ in samples if r == route and status == 503)
+        print(
+            f"  {route:<13} requests {len(latencies):>5}  503 {shed:>5}  "
+            f"p99 all {percentile(latencies, 0.99) * 1000:8.1f} ms  "
+            f"p99 served {percentile(served, 0.99) * 1000:8.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overload API-Improved.py over HTTP, with and without admission control.")
+    parser.add_argument("--rate", type=float, default=120.0, help="Offered requests per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per run")
+    parser.add_argument("--users", type=int, default=20, help="Pre-registered users sending requests")
+    args = parser.parse_args()
+
+    api = load_api()
+    logging.disable(logging.CRITICAL)
+    api.limiter.enabled = False  # Measure admission control, not the per-IP rate limits
+    password_hash = generate_password_hash(PASSWORD)  # Logins still run the real check
+    for i in range(args.users):
+        api.auth_manager.register_user(api.User.from_hash(f"user-{i}", password_hash, 30, 'Other'))
+
+    server = make_server('127.0.0.1', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.port}"
+    tokens = []
+    for i in range(args.users):
+        body = json.dumps({'name': f"user-{i}", 'password': PASSWORD}).encode()
+        req = urllib.request.Request(f"{base_url}/authenticate", data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req) as resp:
+            tokens.append((f"user-{i}", json.load(resp)['access_token']))
+
+    shipped = api.app.config['ADMISSION_CLASSES']
+    # Re-initialize the app's controller in place: the route decorators hold a reference to it
+    api.admission.__init__(10 ** 6, {
+        name: dict(settings, limit=10 ** 6, queue=10 ** 6, deadline=3600) for name, settings in shipped.items()
+    })
+    report("Without admission control", run(base_url, tokens, args.rate, args.duration))
+
+    api.admission.__init__(api.app.config['ADMISSION_MAX_CONCURRENCY'], shipped)
+    report("With the shipped admission config", run(base_url, tokens, args.rate, args.duration))
+    print(json.dumps(api.admission.metrics()['classes']))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
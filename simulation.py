@@ -0,0 +1,131 @@
+import argparse
+import collections
+import logging
+import multiprocessing
+import random
+import statistics
+import time
+
+from lab_3 import Bank, User
+
+GENDERS = ["Male", "Female", "Other"]
+
+
+def activity_counts(users, transactions, seed):
+    """
+    Draw how many of the transactions each account receives.
+
+    The counts come from one generator seeded only by `seed`, so they do not
+    depend on how the accounts are later split across processes.
+    """
+    rng = random.Random(f"{seed}-activity")
+    counts = collections.Counter()
+    for start in range(0, transactions, 1_000_000):
+        counts.update(rng.choices(range(users), k=min(1_000_000, transactions - start)))
+    return counts
+
+
+def event_stream(accounts, seed, mean_amount, withdraw_ratio):
+    """
+    Yield the synthetic events of one account partition.
+
+    `accounts` is a list of (account_id, transaction count) pairs. Every
+    account draws its user and transactions from its own generator, seeded by
+    `seed` and the account id, so results do not depend on the partitioning.
+    """
+    for account_id, count in accounts:
+        rng = random.Random(f"{seed}-{account_id}")
+        yield "open", account_id, User(f"user{account_id}", rng.randint(18, 90), rng.choice(GENDERS))
+        for _ in range(count):
+            kind = "withdraw" if rng.random() < withdraw_ratio else "deposit"
+            yield kind, account_id, round(rng.expovariate(1 / mean_amount), 2)
+
+
+def run_partition(args):
+    """
+    Drive one partition's event stream through lab_3 Bank accounts.
+    """
+    previous = logging.root.manager.disable
+    logging.disable(logging.CRITICAL)
+    accounts = {}
+    rejected = 0
+    try:
+        for kind, account_id, payload in event_stream(*args):
+            if kind == "open":
+                accounts[account_id] = Bank(payload)
+                continue
+            bank = accounts[account_id]
+            before = bank.balance
+            if kind == "deposit":
+                bank.deposit(payload)
+            else:
+                bank.withdraw(payload)
+            if bank.balance == before:
+                rejected += 1
+    finally:
+        logging.disable(previous)  # Partitions may run in the caller's process
+    return [bank.balance for bank in accounts.values()], rejected
+
+
+def simulate(users, transactions, workers=None, seed=0, mean_amount=100.0, withdraw_ratio=0.4):
+    """
+    Run the simulation across processes and return summary statistics.
+    """
+    if users < 1:
+        raise ValueError("The simulation needs at least one user.")
+    partitions = max(min(workers or multiprocessing.cpu_count(), users), 1)
+    start = time.perf_counter()
+    counts = activity_counts(users, transactions, seed)
+    jobs = [
+        ([(account_id, counts[account_id]) for account_id in range(partition, users, partitions)],
+         seed, mean_amount, withdraw_ratio)
+        for partition in range(partitions)
+    ]
+    if partitions == 1:
+        results = [run_partition(jobs[0])]
+    else:
+        with multiprocessing.Pool(partitions) as pool:
+            results = pool.map(run_partition, jobs)
+    elapsed = time.perf_counter() - start
+
+    balances = sorted(balance for partition_balances, _ in results for balance in partition_balances)
+
+    def percentile(q):
+        return balances[int((len(balances) - 1) * q)]
+
+    return {
+        "users": len(balances),
+        "transactions": transactions,
+        "rejected": sum(rejected for _, rejected in results),
+        "total_balance": float(sum(balances)),
+        "mean": statistics.fmean(balances),
+        "stdev": statistics.pstdev(balances),
+        "min": float(balances[0]),
+        "p10": float(percentile(0.10)),
+        "median": float(percentile(0.50)),
+        "p90": float(percentile(0.90)),
+        "p99": float(percentile(0.99)),
+        "max": float(balances[-1]),
+        "zero_balance": sum(1 for balance in balances if balance == 0),
+        "seconds": elapsed,
+        "transactions_per_second": transactions / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline balance simulation on the lab_3 Bank model.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mean-amount", type=float, default=100.0, help="Mean transaction amount")
+    parser.add_argument("--withdraw-ratio", type=float, default=0.4, help="Share of transactions that are withdrawals")
+    args = parser.parse_args()
+
+    summary = simulate(args.users, args.transactions, args.workers, args.seed, args.mean_amount, args.withdraw_ratio)
+    for key, value in summary.items():
+        print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from admission import AdmissionController
+
+CLASSES = {
+    'read': {'priority': 0, 'limit': 1, 'queue': 4, 'deadline': 1.0},
+    'register': {'priority': 1, 'limit': 1, 'queue': 1, 'deadline': 0.05}
+}
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.admission = AdmissionController(1, CLASSES)
+
+    def wait_for_waiters(self, name, count):
+        while self.admission.metrics()['classes'][name]['waiting'] < count:
+            time.sleep(0.001)
+
+    def test_higher_priority_admitted_first(self):
+        self.admission = AdmissionController(1, dict(CLASSES, register=dict(CLASSES['register'], deadline=1.0)))
+        order = []
+
+        def request(name):
+            self.admission.acquire(name)
+            order.append(name)
+            self.admission.release(name)
+
+        self.assertTrue(self.admission.acquire('read'))
+        register = threading.Thread(target=request, args=('register',))
+        register.start()
+        self.wait_for_waiters('register', 1)
+        read = threading.Thread(target=request, args=('read',))
+        read.start()
+        self.wait_for_waiters('read', 1)
+        self.admission.release('read')
+        register.join()
+        read.join()
+        self.assertEqual(order, ['read', 'register'])
+
+    def test_deadline_sheds_waiting_request(self):
+        self.assertTrue(self.admission.acquire('read'))
+        self.assertFalse(self.admission.acquire('register'))
+        stats = self.admission.metrics()['classes']['register']
+        self.assertEqual((stats['shed'], stats['waiting']), (1, 0))
+        self.admission.release('read')
+        self.assertTrue(self.admission.acquire('register'))
+
+    def test_full_queue_rejects_immediately(self):
+        self.assertTrue(self.admission.acquire('read'))
+        waiter = threading.Thread(target=self.admission.acquire, args=('register',))
+        waiter.start()
+        self.wait_for_waiters('register', 1)
+        start = time.monotonic()
+        self.assertFalse(self.admission.acquire('register'))
+        self.assertLess(time.monotonic() - start, 0.04)
+        self.assertEqual(self.admission.metrics()['classes']['register']['rejected'], 1)
+        waiter.join()
+
+    def test_admit_decorator_sheds_with_503(self):
+        app = Flask(__name__)
+
+        @app.route('/register', methods=['POST'])
+        @self.admission.admit('register')
+        def register():
+            return {'message': 'ok'}, 201
+
+        client = app.test_client()
+        self.assertEqual(client.post('/register').status_code, 201)
+        self.assertTrue(self.admission.acquire('read'))  # Take the only slot
+        response = client.post('/register')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertIn('error', response.get_json())
+
+
+if __name__ == "__main__":
+    unittest.main()
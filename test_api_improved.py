@@ -0,0 +1,303 @@
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from werkzeug.serving import make_server
+
+API_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'API-Improved.py')
+
+
+def load_app(module_name, primary_url=None):
+    """
+    Load a fresh copy of API-Improved.py. Every copy has its own AuthManager,
+    so one test can run a primary and followers side by side.
+    """
+    if primary_url:
+        os.environ['BANK_PRIMARY_URL'] = primary_url
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, API_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.environ.pop('BANK_PRIMARY_URL', None)
+    module.app.config['TESTING'] = True
+    return module
+
+
+class ServedApp:
+    def __init__(self, module_name):
+        """
+        Serve a primary over HTTP on a free local port.
+        """
+        self.module = load_app(module_name)
+        self._server = make_server('127.0.0.1', 0, self.module.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self._server.port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        self._server.shutdown()
+
+
+def setUpModule():
+    logging.disable(logging.CRITICAL)
+
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestReplication(unittest.TestCase):
+    def setUp(self):
+        self.primary = ServedApp('primary')
+        self.follower = load_app('follower', self.primary.url)
+        self.primary_client = self.primary.module.app.test_client()
+        self.follower_client = self.follower.app.test_client()
+
+        self.primary_client.post('/register', json={'name': 'Edison', 'password': 'secret', 'age': 20, 'gender': 'Male'})
+        response = self.primary_client.post('/authenticate', json={'name': 'Edison', 'password': 'secret'})
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def tearDown(self):
+        self.primary.shutdown()
+
+    def test_follower_applies_events_in_order(self):
+        self.primary_client.post('/bank/deposit', json={'amount': 100}, headers=self.headers)
+        self.primary_client.post('/bank/withdraw', json={'amount': 30}, headers=self.headers)
+        self.assertTrue(self.follower.replicator.sync())
+        self.assertEqual(self.follower.auth_manager.head, self.primary.module.auth_manager.head)
+
+        response = self.follower_client.get('/bank/balance', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['account_balance'], 70)
+
+        response = self.follower_client.post('/authenticate', json={'name': 'Edison', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_out_of_order_event_rejected(self):
+        self.follower.replicator.sync()
+        event = {'seq': self.follower.auth_manager.head + 2, 'type': 'deposit', 'name': 'Edison', 'amount': 5}
+        with self.assertRaises(ValueError):
+            self.follower.auth_manager.apply_event(event)
+
+    def test_follower_rejects_writes(self):
+        self.follower.replicator.sync()
+        response = self.follower_client.post('/bank/deposit', json={'amount': 100}, headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+        response = self.follower_client.post('/register', json={'name': 'Jane', 'password': 'p', 'age': 25, 'gender': 'Female'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.follower.auth_manager.head, self.primary.module.auth_manager.head)
+
+    def test_stale_follower_returns_503(self):
+        response = self.follower_client.get('/bank/balance', headers=self.headers)
+        self.assertEqual(response.status_code, 503)  # Never synced
+
+        self.follower.replicator.sync()
+        response = self.follower_client.get('/bank/balance', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        self.follower.app.config['MAX_STALENESS_SECONDS'] = 0.05
+        time.sleep(0.1)
+        response = self.follower_client.get('/bank/balance', headers=self.headers)
+        self.assertEqual(response.status_code, 503)
+
+    def test_restarted_primary_detected(self):
+        self.follower.replicator.sync()
+        restarted = ServedApp('restarted_primary')
+        try:
+            follower = load_app('follower_of_restarted', restarted.url)
+            follower.auth_manager.apply_event(dict(self.primary.module.auth_manager.changes_since(0)[1][0]))
+            with self.assertRaises(RuntimeError):
+                follower.replicator.sync()
+            self.assertEqual(follower.replicator.staleness(), float('inf'))
+        finally:
+            restarted.shutdown()
+
+    def test_restarted_primary_ahead_detected(self):
+        self.primary_client.post('/bank/deposit', json={'amount': 100}, headers=self.headers)
+        self.follower.replicator.sync()
+        restarted = ServedApp('restarted_ahead_primary')
+        try:
+            # The restarted primary logs more events than the follower applied
+            for name in ['Edison', 'Jane', 'John', 'Mary']:
+                restarted.module.auth_manager.register_user(restarted.module.User.from_hash(name, 'hash', 30, 'Other'))
+            restarted.module.auth_manager.deposit('Edison', 5)
+            self.assertGreater(restarted.module.auth_manager.head, self.follower.auth_manager.head)
+
+            head = self.follower.auth_manager.head
+            self.follower.replicator._primary_url = restarted.url
+            with self.assertRaises(RuntimeError):
+                self.follower.replicator.sync()
+            self.assertEqual(self.follower.auth_manager.head, head)
+            self.assertEqual(self.follower.auth_manager.account('Edison').balance, 100)
+        finally:
+            restarted.shutdown()
+
+    def test_snapshot_served_to_lagging_follower(self):
+        auth_manager = self.primary.module.auth_manager
+        auth_manager.LOG_RETENTION = 3
+        for amount in [10, 20, 30, 40]:
+            self.primary_client.post('/bank/deposit', json={'amount': amount}, headers=self.headers)
+        self.primary_client.post('/logout', headers=self.headers)
+        self.assertLess(len(auth_manager._log), 3)
+        self.assertIsNotNone(auth_manager._snapshot)
+
+        self.assertTrue(self.follower.replicator.sync())
+        self.assertEqual(self.follower.auth_manager.head, auth_manager.head)
+        self.assertEqual(self.follower.auth_manager.account('Edison').balance, 100)
+        jti = auth_manager._revoked.items()[0][0]
+        self.assertTrue(self.follower.auth_manager.is_revoked(jti))
+        response = self.follower_client.post('/authenticate', json={'name': 'Edison', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_replication_log_requires_token(self):
+        response = self.primary_client.get('/replication/log')
+        self.assertEqual(response.status_code, 403)
+
+    def test_non_finite_amount_rejected(self):
+        for amount in ['nan', 'inf']:
+            response = self.primary_client.post('/bank/deposit', json={'amount': amount}, headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.primary.module.auth_manager.account('Edison').balance, 0)
+
+    def test_duplicate_registration_rejected(self):
+        self.primary_client.post('/bank/deposit', json={'amount': 100}, headers=self.headers)
+        response = self.primary_client.post('/register', json={'name': 'Edison', 'password': 'other', 'age': 30, 'gender': 'Male'})
+        self.assertEqual(response.status_code, 409)
+        response = self.primary_client.post('/authenticate', json={'name': 'Edison', 'password': 'other'})
+        self.assertEqual(response.status_code, 401)
+
+
+class TestUserSearch(unittest.TestCase):
+    def setUp(self):
+        self.api = load_app('search')
+        self.client = self.api.app.test_client()
+        self.auth_manager = self.api.auth_manager
+        rng = random.Random(0)
+        self.api.NameIndex.BUCKET_SIZE = 8  # Force bucket splits with few users
+        self.auth_manager._names = self.api.NameIndex()
+        names = {rng.choice(['ab', 'abc', 'b', 'az', 'u', '\U0010ffff']) + str(rng.randint(0, 300)) for _ in range(600)}
+        for name in sorted(names, key=lambda _: rng.random()):
+            user = self.api.User.from_hash(name, 'hash', rng.randint(1, 90), rng.choice(['Male', 'Female', 'Other']))
+            self.auth_manager.register_user(user)
+
+    def tearDown(self):
+        self.api.NameIndex.BUCKET_SIZE = 1000
+
+    def full_scan(self, prefix=None, gender=None, min_age=None, max_age=None):
+        return sorted(
+            user.name for user in self.auth_manager._users.values()
+            if (not prefix or user.name.startswith(prefix))
+            and (gender is None or user.gender == gender)
+            and (min_age is None or user.age >= min_age)
+            and (max_age is None or user.age <= max_age)
+        )
+
+    def test_search_matches_full_scan(self):
+        for prefix in [None, 'a', 'ab', 'abc1', 'b', 'zz', '\U0010ffff']:
+            for gender in [None, 'Other']:
+                for min_age, max_age in [(None, None), (18, 25), (None, 40), (60, None)]:
+                    query = (prefix, gender, min_age, max_age)
+                    total, users = self.auth_manager.search_users(*query)
+                    expected = self.full_scan(*query)
+                    self.assertEqual([user.name for user in users], expected, query)
+                    self.assertEqual(total, len(expected), query)
+
+                    total, users = self.auth_manager.search_users(*query, offset=5, limit=7)
+                    self.assertEqual([user.name for user in users], expected[5:12], query)
+                    self.assertEqual(total, len(expected), query)
+
+    def test_admin_route_requires_token(self):
+        response = self.client.get('/admin/users')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/admin/users', headers={'X-Admin-Token': 'wrong'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_route_paginates(self):
+        headers = {'X-Admin-Token': self.api.app.config['ADMIN_TOKEN']}
+        response = self.client.get('/admin/users?prefix=ab&gender=Other&page=2&per_page=3', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        expected = self.full_scan('ab', 'Other')
+        self.assertEqual([user['name'] for user in data['users']], expected[3:6])
+        self.assertEqual((data['total'], data['page'], data['per_page']), (len(expected), 2, 3))
+
+        response = self.client.get('/admin/users?prefix=%F4%8F%BF%BF', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['total'], len(self.full_scan('\U0010ffff')))
+
+    def test_admin_route_rejects_bad_parameters(self):
+        headers = {'X-Admin-Token': self.api.app.config['ADMIN_TOKEN']}
+        for query in ['min_age=x', 'max_age=1.5', 'page=one', 'per_page=']:
+            response = self.client.get(f'/admin/users?{query}', headers=headers)
+            self.assertEqual(response.status_code, 400, query)
+
+
+class TestTokenVerification(unittest.TestCase):
+    def setUp(self):
+        self.primary = ServedApp('token_primary')
+        self.api = self.primary.module
+        self.client = self.api.app.test_client()
+        self.client.post('/register', json={'name': 'Edison', 'password': 'secret', 'age': 20, 'gender': 'Male'})
+        response = self.client.post('/authenticate', json={'name': 'Edison', 'password': 'secret'})
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def tearDown(self):
+        self.primary.shutdown()
+
+    def test_cache_hit_skips_decoding(self):
+        with mock.patch.object(self.api, 'decode_token', wraps=self.api.decode_token) as decode:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/bank/balance', headers=self.headers).status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_cached_token_expires(self):
+        with self.api.app.app_context():
+            token = self.api.create_access_token(
+                identity='Edison', expires_delta=timedelta(seconds=1),
+                additional_claims={'instance': self.api.primary_instance()}
+            )
+        headers = {'Authorization': f"Bearer {token}"}
+        self.assertEqual(self.client.get('/bank/balance', headers=headers).status_code, 200)
+        time.sleep(2)
+        self.assertEqual(self.client.get('/bank/balance', headers=headers).status_code, 401)
+
+    def test_logout_revokes_cached_token(self):
+        self.assertEqual(self.client.get('/bank/balance', headers=self.headers).status_code, 200)
+        self.assertEqual(self.client.post('/logout', headers=self.headers).status_code, 200)
+        self.assertEqual(self.client.get('/bank/balance', headers=self.headers).status_code, 401)
+
+    def test_revocation_replicates_to_followers(self):
+        follower = load_app('token_follower', self.primary.url)
+        follower_client = follower.app.test_client()
+        follower.replicator.sync()
+        self.assertEqual(follower_client.get('/bank/balance', headers=self.headers).status_code, 200)
+
+        self.client.post('/logout', headers=self.headers)
+        follower.replicator.sync()
+        self.assertEqual(follower_client.get('/bank/balance', headers=self.headers).status_code, 401)
+
+    def test_token_rejected_after_primary_restart(self):
+        restarted = load_app('token_restarted_primary')
+        restarted.auth_manager.register_user(restarted.User.from_hash('Edison', 'hash', 20, 'Male'))
+        client = restarted.app.test_client()
+        response = client.get('/bank/balance', headers=self.headers)
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_set_prunes_without_recursing(self):
+        revoked = self.api.RevocationSet(prune_threshold=16)
+        for i in range(100):
+            revoked.add(f"live-{i}", time.time() + 60)
+        revoked.add('expired', time.time() - 1)
+        revoked.prune()
+        self.assertTrue(all(f"live-{i}" in revoked for i in range(100)))
+        self.assertNotIn('expired', revoked)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+from simulation import simulate
+
+
+class TestSimulation(unittest.TestCase):
+    def test_fixed_seed_summary(self):
+        summary = simulate(2000, 20000, workers=1, seed=1)
+        self.assertEqual(summary["users"], 2000)
+        self.assertEqual(summary["transactions"], 20000)
+        self.assertEqual(summary["rejected"], 2958)
+        self.assertAlmostEqual(summary["total_balance"], 805821.07, places=2)
+
+    def test_worker_count_does_not_change_results(self):
+        single = simulate(500, 5000, workers=1, seed=7)
+        double = simulate(500, 5000, workers=2, seed=7)
+        for key in ["users", "rejected", "total_balance", "median", "p99", "max", "zero_balance"]:
+            self.assertEqual(single[key], double[key], key)
+
+
+if __name__ == "__main__":
+    unittest.main()